@@ -1,7 +1,8 @@
 def ce_next(
     M: Dict[Tuple[int, int], np.array], 
     block_sizes_new: List[int], 
-    close_blocks: List[Set[int]]
+    close_blocks: List[Set[int]],
+    rank_control: Optional[RankControl] = None
 ) -> Tuple[
     List[int], 
     int, 
@@ -18,6 +19,9 @@ def ce_next(
     M (dict): The matrix in sparse block format.
     block_sizes_new (list): The new sizes of the blocks.
     close_blocks (list): The close blocks.
+    rank_control (RankControl): Rank-control policy for the compression stage,
+      relative tolerance 10**(-6) if not given. Pass the policy used by ce to
+      continue its level schedule and error budget.
 
     Returns:
     tuple: Contains the following elements:
@@ -36,12 +40,16 @@ def ce_next(
     M_size = len(block_sizes_new)
     block_sizes_new = []
 
+    if rank_control is None:
+        rank_control = RankControl()
+    rank_control.start_level()
+
     for iter in tqdm(range(M_size)):
         nonzero_line, nonzero_col = get_nonzero_line_and_column_indexes(M, iter)
 
         # Compression
         U, M, r, close_blocks = compress(
-            M, M_size, iter, 10**(-6), close_blocks, nonzero_line, nonzero_col
+            M, M_size, iter, rank_control, close_blocks, nonzero_line, nonzero_col
         )
         Q_U.append(U)
         block_sizes_new.append(r)
@@ -2,7 +2,8 @@ def ce(
     M: Dict[Tuple[int, int], np.array], 
     block_sizes: List[int], 
     close_blocks: List[Set], 
-    M_size: int
+    M_size: int,
+    rank_control: Optional[RankControl] = None
 ) -> Tuple[
     List[int], 
     int, 
@@ -20,6 +21,9 @@ def ce(
     block_sizes (list): The sizes of the blocks.
     close_blocks (list): The close blocks.
     M_size (int): The number of block rows.
+    rank_control (RankControl): Rank-control policy for the compression stage,
+      relative tolerance 10**(-6) if not given. It is reset here, so this call
+      is level 0; rank_control.report() gives the achieved accuracy.
 
     Returns:
     tuple: Contains the following elements:
@@ -36,12 +40,17 @@ def ce(
     Q_U = []
     block_sizes_new = []
 
+    if rank_control is None:
+        rank_control = RankControl()
+    rank_control.reset()
+    rank_control.start_level()
+
     for iter in tqdm(range(M_size)):
         nonzero_line, nonzero_col = get_nonzero_line_and_column_indexes(M, iter)
 
         # Compression
         U, M, r, close_blocks = compress(
-            M, M_size, iter, 10**(-6), close_blocks, nonzero_line, nonzero_col
+            M, M_size, iter, rank_control, close_blocks, nonzero_line, nonzero_col
         )
         Q_U.append(U)
         block_sizes_new.append(r)
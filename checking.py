@@ -8,3 +8,23 @@ M_dense = blocks_to_full_matrix(M, block_sizes)
 
 M_to_B = apply_permutation(M_dense, prm_inv)
 print(np.sum(M_to_B - B_dense))
+
+# check domain decomposition: ce_parallel is ce applied to the renumbered matrix
+# (up to the choice of singular vectors, so compare ranks, block pattern and errors)
+
+rank_control_par = RankControl()
+block_prm, ranks_par, _, close_par, _, _, _, M_par = ce_parallel(
+    copy.deepcopy(M), block_sizes, copy.deepcopy(close_blocks), M_size,
+    n_subdomains=4, rank_control=rank_control_par
+)
+
+rank_control_ser = RankControl()
+M_ren, block_sizes_ren, close_blocks_ren = renumber_blocks(
+    copy.deepcopy(M), block_sizes, copy.deepcopy(close_blocks), block_prm
+)
+ranks_ser, _, close_ser, _, _, _, M_ser = ce(
+    M_ren, block_sizes_ren, close_blocks_ren, M_size, rank_control_ser
+)
+
+print(ranks_par == ranks_ser, close_par == close_ser, M_par.keys() == M_ser.keys())
+print(rank_control_par.report()['total_error'], rank_control_ser.report()['total_error'])
@@ -2,7 +2,7 @@ def compress(
     M: Dict[Tuple[int, int], np.array],
     M_size: int,
     iter: int,
-    eps: float,
+    rank_control: RankControl,
     close_blocks: List[Set],
     nonzero_line: List[int],
     nonzero_col: List[int],
@@ -14,7 +14,8 @@ def compress(
         M: Matrix (of size M_size) in sparse block format.
         M_size: The number of block rows.
         iter: The number of the current iteration.
-        eps: Singular value relative tolerance for truncated SVD
+        rank_control: Rank-control policy choosing the rank of the truncated SVD
+          and recording the truncation error.
         close_blocks: List of sets with close blocks indexes:
           close_blocks[line] has column indexes of nonzero blocks.
         nonzero_line: Indexes of nonzero elements in the iter-th line (iter, col).
@@ -70,7 +71,7 @@ def compress(
       M, close_blocks = check_zero(M, iter, col, close_blocks)
 
     # Compress far blocks
-    r = len(S[S/S[0] > eps])
+    r = rank_control.truncate(S)
 
     for col in far_line_ind:
       M[iter, col] = M[iter, col][:r, :]
@@ -0,0 +1,441 @@
+def partition_subdomains(
+    M: Dict[Tuple[int, int], np.array],
+    M_size: int,
+    n_subdomains: int
+) -> Tuple[List[List[int]], List[int]]:
+    """
+    Splits block rows into subdomains with METIS and separates the interface.
+
+    Args:
+        M: Matrix in sparse block format.
+        M_size: The number of block rows.
+        n_subdomains: The number of subdomains.
+
+    Returns:
+        interior: interior[k] has indexes of block rows coupled only to blocks
+          of subdomain k and to the interface.
+        interface: Indexes of block rows separating the subdomains: every nonzero
+          block (line, col) with line and col in different subdomains has line
+          or col in the interface.
+    """
+    G = nx.Graph()
+    G.add_nodes_from(range(M_size))
+    G.add_edges_from((line, col) for (line, col) in M.keys() if line != col)
+
+    _, parts = metis.part_graph(G, nparts=n_subdomains, recursive=True)
+
+    # For every cut block put one of its block rows into the interface
+    interface = set()
+    for (line, col) in M.keys():
+        if parts[line] != parts[col] and not {line, col} & interface:
+            interface.add(line if parts[line] > parts[col] else col)
+
+    interior = [[] for _ in range(n_subdomains)]
+    for block in range(M_size):
+        if block not in interface:
+            interior[parts[block]].append(block)
+
+    return interior, sorted(interface)
+
+
+def renumber_blocks(
+    M: Dict[Tuple[int, int], np.array],
+    block_sizes: List[int],
+    close_blocks: List[Set[int]],
+    block_prm: List[int]
+) -> Tuple[Dict[Tuple[int, int], np.array], List[int], List[Set[int]]]:
+    """
+    Applies a permutation of block rows and columns to the sparse block format.
+
+    Args:
+        M: Matrix in sparse block format.
+        block_sizes: The sizes of the blocks.
+        close_blocks: The close blocks.
+        block_prm: block_prm[new] is the old index of the block at position new.
+
+    Returns:
+        M: Permuted matrix in sparse block format.
+        block_sizes: Permuted sizes of the blocks.
+        close_blocks: Permuted close blocks.
+    """
+    prm_inv = inverse_permutation(block_prm)
+
+    M_new = {
+        (int(prm_inv[line]), int(prm_inv[col])): block
+        for (line, col), block in M.items()
+    }
+    block_sizes_new = [block_sizes[old] for old in block_prm]
+    close_blocks_new = [
+        {int(prm_inv[col]) for col in close_blocks[old]} for old in block_prm
+    ]
+
+    return M_new, block_sizes_new, close_blocks_new
+
+
+def eliminate_pivots(
+    M: Dict[Tuple[int, int], np.array],
+    pivots: List[int],
+    block_sizes: List[int],
+    M_size: int,
+    close_blocks: List[Set[int]],
+    rank_control: RankControl,
+    progress: bool = False
+) -> Tuple[
+    Dict[Tuple[int, int], np.array],
+    List[Set[int]],
+    Dict[int, int],
+    Dict[int, Dict[Tuple[int, int], np.array]],
+    Dict[int, Dict[Tuple[int, int], np.array]],
+    Dict[int, np.array]
+]:
+    """
+    Compresses and eliminates the given pivots in order, as ce does for all of them.
+
+    Args:
+        M: Matrix in sparse block format.
+        pivots: Indexes of block rows to process.
+        block_sizes: The sizes of the blocks.
+        M_size: The number of block rows.
+        close_blocks: The close blocks.
+        rank_control: Rank-control policy for the compression stage.
+        progress: Show a progress bar.
+
+    Returns:
+        M: The updated matrix.
+        close_blocks: The close blocks.
+        ranks: ranks[iter] is the rank of far blocks of pivot iter.
+        M_L: M_L[iter] is the M_L block column of pivot iter.
+        M_R: M_R[iter] is the M_R block row of pivot iter.
+        Q_U: Q_U[iter] is the U matrix of pivot iter.
+    """
+    ranks, M_L, M_R, Q_U = {}, {}, {}, {}
+
+    for iter in (tqdm(pivots) if progress else pivots):
+        nonzero_line, nonzero_col = get_nonzero_line_and_column_indexes(M, iter)
+
+        # Compression
+        U, M, r, close_blocks = compress(
+            M, M_size, iter, rank_control, close_blocks, nonzero_line, nonzero_col
+        )
+        Q_U[iter] = U
+        ranks[iter] = r
+
+        # Elimination
+        M_L[iter], M, M_R[iter], close_blocks = eliminate(
+            M, iter, block_sizes[iter], r, M_size, close_blocks,
+            nonzero_line, nonzero_col
+        )
+
+    return M, close_blocks, ranks, M_L, M_R, Q_U
+
+
+def pack_blocks(
+    blocks: Dict[Tuple, np.array],
+    name: Optional[str] = None
+) -> Tuple[shared_memory.SharedMemory, Dict[Tuple, Tuple[int, Tuple, str]]]:
+    """
+    Writes blocks into a new shared memory segment, each with its own dtype.
+
+    Args:
+        blocks: Blocks to write, any hashable keys.
+        name: Name of the segment, a random one if not given.
+
+    Returns:
+        shm: The segment, to be unlinked by the caller.
+        layout: layout[key] = (offset, shape, dtype) locates block key in shm.
+    """
+    # Every block starts at a multiple of 16 bytes, enough for complex128
+    layout, offset = {}, 0
+    for key, block in blocks.items():
+        block = np.asarray(block)
+        layout[key] = (offset, block.shape, block.dtype.str)
+        offset += -(-block.nbytes // 16) * 16
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(1, offset))
+    for key, (block_offset, shape, dtype) in layout.items():
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=block_offset)[...] = (
+            blocks[key]
+        )
+
+    return shm, layout
+
+
+def unpack_blocks(
+    shm: shared_memory.SharedMemory,
+    layout: Dict[Tuple, Tuple[int, Tuple, str]],
+    copy_blocks: bool = False
+) -> Dict[Tuple, np.array]:
+    """
+    Reads blocks written by pack_blocks.
+
+    Args:
+        shm: The segment.
+        layout: Block positions returned by pack_blocks.
+        copy_blocks: Return copies instead of views into shm (views keep shm from
+          being closed).
+
+    Returns:
+        blocks: Blocks with the keys of layout.
+    """
+    blocks = {}
+    for key, (offset, shape, dtype) in layout.items():
+        block = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        blocks[key] = block.copy() if copy_blocks else block
+
+    return blocks
+
+
+def factor_subdomain(task: Tuple) -> Tuple:
+    """
+    Worker process: eliminates the interior pivots of one subdomain.
+
+    The blocks are views into the input segment and elimination updates them
+    in place, which is safe since every block belongs to one subdomain. The
+    results are written into a new output segment out_name, which the caller
+    has to unlink (also if this worker fails, the segment may exist).
+
+    Args:
+        task: Tuple (shm_name, layout, pivots, block_sizes, M_size, close_rows,
+          rank_control, out_name), where layout locates the blocks of the
+          subdomain in the shared memory segment shm_name (see pack_blocks),
+          and close_rows[line] are the close blocks of the local block rows.
+
+    Returns:
+        tuple: Layout of the output segment with the local matrix
+          (keys ('M', line, col); interface-interface blocks are Schur
+          complement updates), M_L, M_R (keys ('M_L', iter, line, col) etc.)
+          and Q_U (keys ('Q_U', iter)); then close_rows, ranks and rank_control.
+    """
+    (shm_name, layout, pivots, block_sizes, M_size, close_rows, rank_control,
+     out_name) = task
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    M = unpack_blocks(shm, layout)
+
+    close_blocks = [set() for _ in range(M_size)]
+    for line, cols in close_rows.items():
+        close_blocks[line] = set(cols)
+
+    M, close_blocks, ranks, M_L, M_R, Q_U = eliminate_pivots(
+        M, pivots, block_sizes, M_size, close_blocks, rank_control
+    )
+    close_rows = {line: close_blocks[line] for line in close_rows}
+
+    out = {('M',) + key: block for key, block in M.items()}
+    for name, factor in (('M_L', M_L), ('M_R', M_R)):
+        for iter, blocks in factor.items():
+            out.update({(name, iter) + key: block for key, block in blocks.items()})
+    out.update({('Q_U', iter): U for iter, U in Q_U.items()})
+
+    out_shm, out_layout = pack_blocks(out, out_name)
+    out_shm.close()
+
+    # Drop the views into the input segment before closing it
+    del M, out
+    shm.close()
+
+    return out_layout, close_rows, ranks, rank_control
+
+
+def ce_parallel(
+    M: Dict[Tuple[int, int], np.array],
+    block_sizes: List[int],
+    close_blocks: List[Set],
+    M_size: int,
+    n_subdomains: int = 4,
+    n_workers: Optional[int] = None,
+    rank_control: Optional[RankControl] = None
+) -> Tuple[
+    List[int],
+    List[int],
+    int,
+    List[Set],
+    List[Dict[Tuple[int, int], np.array]],
+    List[Dict[Tuple[int, int], np.array]],
+    List[np.array],
+    Dict[Tuple[int, int], np.array]
+]:
+    """
+    Perform a full iteration of the algorithm by domain decomposition.
+
+    Block rows are split into subdomains with METIS and renumbered so that the
+    interior blocks of every subdomain come first and the interface last. The
+    interiors do not interact, so they are factored in separate processes.
+    Workers update their blocks in place in one multiprocessing.shared_memory
+    segment and return the results in per-worker segments, so no block data
+    goes through the pool's pipes. Their Schur complement updates of the
+    interface are summed up, and the interface is factored with compress and
+    eliminate as in ce. The result is ce applied to the renumbered matrix (up
+    to the choice of singular vectors).
+
+    Parameters:
+    M (dict): The matrix in sparse block format.
+    block_sizes (list): The sizes of the blocks.
+    close_blocks (list): The close blocks.
+    M_size (int): The number of block rows.
+    n_subdomains (int): The number of subdomains.
+    n_workers (int): The number of worker processes, one per subdomain if not
+      given. With one worker the subdomains are factored in this process.
+      Workers are started with fork (also where it is not the default), so
+      more than one worker needs a platform with fork, i.e. not Windows.
+    rank_control (RankControl): Rank-control policy for the compression stage,
+      relative tolerance 10**(-6) if not given. It is reset here, so this call
+      is level 0. The error budget is split between the subdomains and the
+      interface in proportion to their numbers of pivots. The shares are fixed
+      in advance and unused budget is not passed on, so this is more
+      conservative than ce with the same budget (higher ranks).
+
+    Returns:
+    tuple: Contains the following elements:
+        - block_prm (list): block_prm[new] is the old index of block new; all
+          other elements use the new indexes.
+        - block_sizes_new (list): The new sizes of the blocks.
+        - M_size (int): The number of block rows.
+        - close_blocks (list): The close blocks.
+        - M_L_array (list): The M_L matrices with only non-zero and non-unit elements.
+        - M_R_array (list): The M_R matrices with only non-zero and non-unit elements.
+        - Q_U (list): The Q matrices with only non-zero and non-unit elements.
+        - M (dict): The updated matrix.
+    """
+    if rank_control is None:
+        rank_control = RankControl()
+    rank_control.reset()
+    rank_control.start_level()
+
+    interior, interface = partition_subdomains(M, M_size, n_subdomains)
+    interior = [part for part in interior if part]
+
+    # Renumber blocks: interior of subdomain 0, ..., interior of the last one, interface
+    block_prm = [block for part in interior for block in part] + interface
+    M, block_sizes, close_blocks = renumber_blocks(
+        M, block_sizes, close_blocks, block_prm
+    )
+    start = 0
+    for k, part in enumerate(interior):
+        interior[k] = list(range(start, start + len(part)))
+        start += len(part)
+    interface = list(range(start, M_size))
+
+    # Subdomain owning a block row, -1 for the interface
+    owner = [-1] * M_size
+    for k, part in enumerate(interior):
+        for block in part:
+            owner[block] = k
+
+    # Blocks of every subdomain; interface-interface blocks stay in this process
+    local_keys = [[] for _ in interior]
+    M_interface = {}
+    for (line, col), block in M.items():
+        k = owner[line] if owner[line] >= 0 else owner[col]
+        if k >= 0:
+            local_keys[k].append((line, col))
+        else:
+            M_interface[line, col] = block
+
+    shm, layout = pack_blocks({
+        (k,) + key: M[key] for k, keys in enumerate(local_keys) for key in keys
+    })
+    layouts = [{} for _ in interior]
+    for (k, *key), position in layout.items():
+        layouts[k][tuple(key)] = position
+
+    # Shares of the error budget are proportional to the number of pivots
+    weights = [len(part) for part in interior] + [len(interface)]
+    parts = rank_control.split(len(weights), weights)
+    out_names = [f'psm_{secrets.token_hex(8)}' for _ in interior]
+    tasks = []
+    for k, part in enumerate(interior):
+        close_rows = {line: set(close_blocks[line]) for line in part}
+        for line in interface:
+            close_rows[line] = {
+                col for col in close_blocks[line] if owner[col] == k
+            }
+        tasks.append((
+            shm.name, layouts[k], part, block_sizes, M_size, close_rows, parts[k],
+            out_names[k]
+        ))
+
+    try:
+        # fork: factor_subdomain is defined in the notebook, i.e. in __main__,
+        # which workers started by spawn or forkserver cannot unpickle from
+        n_workers = min(n_workers or len(tasks), len(tasks))
+        if n_workers > 1:
+            with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+                results = pool.map(factor_subdomain, tasks)
+        else:
+            results = [factor_subdomain(task) for task in tasks]
+
+        # Assemble the interface Schur complement
+        M = M_interface
+        close_interface = {
+            line: {col for col in close_blocks[line] if owner[col] < 0}
+            for line in interface
+        }
+        ranks, M_L, M_R, Q_U, worker_controls = {}, {}, {}, {}, []
+        for out_name, (out_layout, close_rows, worker_ranks, control) in zip(
+            out_names, results
+        ):
+            out_shm = shared_memory.SharedMemory(name=out_name)
+            out = unpack_blocks(out_shm, out_layout, copy_blocks=True)
+            out_shm.close()
+
+            for (name, *key), block in out.items():
+                if name == 'M':
+                    line, col = key
+                    if owner[line] < 0 and owner[col] < 0 and (line, col) in M:
+                        M[line, col] = M[line, col] + block
+                    else:
+                        M[line, col] = block
+                elif name == 'Q_U':
+                    Q_U[key[0]] = block
+                else:
+                    iter, line, col = key
+                    factor = M_L if name == 'M_L' else M_R
+                    factor.setdefault(iter, {})[line, col] = block
+
+            for line, cols in close_rows.items():
+                if owner[line] < 0:
+                    close_interface[line] |= cols
+                else:
+                    close_blocks[line] = cols
+            ranks.update(worker_ranks)
+            worker_controls.append(control)
+    finally:
+        # Output segments of all workers, also of those finished before a failure
+        shm.close()
+        shm.unlink()
+        for out_name in out_names:
+            try:
+                out_shm = shared_memory.SharedMemory(name=out_name)
+            except FileNotFoundError:
+                continue
+            out_shm.close()
+            out_shm.unlink()
+
+    # Pivots whose M_L or M_R block column is empty
+    for iter in ranks:
+        M_L.setdefault(iter, {})
+        M_R.setdefault(iter, {})
+
+    for line in interface:
+        close_blocks[line] = close_interface[line]
+    for (line, col) in list(M.keys()):
+        if owner[line] < 0 and owner[col] < 0:
+            M, close_blocks = check_zero(M, line, col, close_blocks)
+
+    rank_control.merge(worker_controls)
+
+    # Factor the interface
+    M, close_blocks, *factors = eliminate_pivots(
+        M, interface, block_sizes, M_size, close_blocks, rank_control,
+        progress=True
+    )
+    for result, factor in zip((ranks, M_L, M_R, Q_U), factors):
+        result.update(factor)
+
+    block_sizes_new = [ranks[iter] for iter in range(M_size)]
+    M_L_array = [M_L[iter] for iter in range(M_size)]
+    M_R_array = [M_R[iter] for iter in range(M_size)]
+    Q_U = [Q_U[iter] for iter in range(M_size)]
+
+    return block_prm, block_sizes_new, M_size, close_blocks, M_L_array, M_R_array, Q_U, M
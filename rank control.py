@@ -0,0 +1,282 @@
+class RankControl:
+    """
+    Rank-control policy for the compression stage.
+
+    Decides the rank r kept for the far blocks of every pivot and records
+    the norm of the discarded part, so that the truncations of the whole
+    factorization can be reported afterwards.
+
+    All errors here are local: the Frobenius norm of what one pivot discards
+    from its far blocks, measured in the current (rotated, partly eliminated)
+    matrix. Later pivots and levels map back to the original matrix through
+    the non-orthogonal M_L and M_R factors, which may amplify them, so neither
+    the error budget nor report() bounds the error of the factorization
+    itself.
+
+    Args:
+        eps: Singular value tolerance, used for every level unless
+          level_eps is given.
+        absolute: If True, keep singular values S > eps; otherwise keep
+          S / S[0] > eps (relative tolerance, the default).
+        level_eps: Per-level tolerance schedule: level_eps[level] is used at
+          that level, the last value is reused for deeper levels.
+        max_rank: Hard rank cap, either one int for all levels or a per-level
+          schedule (the last value is reused for deeper levels).
+        error_budget: Upper bound on the root-sum-square of the local truncation
+          errors of all pivots (not on the error of the factorization, see
+          above). Once the remaining budget is smaller
+          than the tolerance-based truncation error, r is increased until the
+          pivot fits into the budget. The rank cap always has priority, so the
+          budget may be exceeded; report() shows whether it was.
+        budget_levels: The number of levels the error budget is spread over.
+          If given, every level gets an equal share of the budget left by the
+          previous levels (the last level gets all of it). If not given, the
+          budget is spent greedily: the first pivots are truncated by the
+          tolerance and, once the budget is used up, all later pivots, also
+          of later ce_next levels, keep full rank.
+    """
+
+    def __init__(
+        self,
+        eps: float = 10**(-6),
+        absolute: bool = False,
+        level_eps: Optional[List[float]] = None,
+        max_rank: Optional[Union[int, List[int]]] = None,
+        error_budget: Optional[float] = None,
+        budget_levels: Optional[int] = None,
+    ):
+        if level_eps is not None:
+            level_eps = list(level_eps)
+        if eps < 0 or (level_eps and min(level_eps) < 0):
+            raise ValueError('Tolerance must be non-negative')
+        if error_budget is not None and error_budget < 0:
+            raise ValueError('Error budget must be non-negative')
+        if budget_levels is not None and (
+            not isinstance(budget_levels, (numbers.Integral, np.integer))
+            or budget_levels < 1
+        ):
+            raise ValueError('Number of budget levels must be a positive integer')
+
+        if isinstance(max_rank, np.ndarray) and max_rank.ndim == 0:
+            max_rank = max_rank.item()
+        if isinstance(max_rank, (list, tuple, np.ndarray)):
+            max_rank = list(max_rank)
+        caps = max_rank if isinstance(max_rank, list) else [max_rank]
+        if max_rank is not None and (not caps or not all(
+            isinstance(cap, (numbers.Integral, np.integer))
+            and not isinstance(cap, bool) and cap >= 0
+            for cap in caps
+        )):
+            raise ValueError('Rank cap must be a non-negative integer')
+
+        self.eps = eps
+        self.absolute = absolute
+        self.level_eps = level_eps if level_eps else None
+        if max_rank is None:
+            self.max_rank = None
+        elif isinstance(max_rank, list):
+            self.max_rank = [int(cap) for cap in max_rank]
+        else:
+            self.max_rank = int(max_rank)
+        self.error_budget = error_budget
+        self.budget_levels = None if budget_levels is None else int(budget_levels)
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the recorded errors and ranks; the next start_level() is level 0.
+        """
+        self.level = -1
+        self.ranks = []
+        self.errors = []
+        self.rel_errors = []
+        self.error_sq = 0.0
+        self.level_error_sq = 0.0
+        self.level_budget_sq = None
+
+    def start_level(self) -> int:
+        """
+        Moves to the next level of the factorization.
+
+        Returns:
+            level: Index of the new level (0 for the first call after reset()).
+        """
+        self.level += 1
+        self.ranks.append([])
+        self.errors.append([])
+        self.rel_errors.append([])
+
+        self.level_error_sq = 0.0
+        if self.error_budget is not None and self.budget_levels is not None:
+            remaining_sq = max(self.error_budget**2 - self.error_sq, 0.0)
+            self.level_budget_sq = remaining_sq / max(
+                1, self.budget_levels - self.level
+            )
+        return self.level
+
+    def remaining_budget_sq(self) -> Optional[float]:
+        """
+        Returns the squared error that may still be discarded at the current
+        level (None if there is no error budget).
+        """
+        if self.error_budget is None:
+            return None
+        if self.level_budget_sq is not None:
+            return self.level_budget_sq - self.level_error_sq
+        return self.error_budget**2 - self.error_sq
+
+    def split(
+        self, n: int, weights: Optional[List[float]] = None
+    ) -> List['RankControl']:
+        """
+        Makes n policies for pivots of the current level factored independently
+        (e.g. in worker processes). Each gets a share of the remaining squared
+        error budget, so the sum of their squared errors stays within it. The
+        shares are fixed in advance: budget one policy leaves unused is not
+        passed on to the others.
+
+        Args:
+            n: Number of policies.
+            weights: Shares of the budget are proportional to weights (e.g. the
+              number of pivots of every policy), equal if not given.
+
+        Returns:
+            parts: Policies with empty records, to be passed to merge() later.
+        """
+        if self.level < 0:
+            self.start_level()
+
+        if weights is None:
+            weights = [1] * n
+        total_weight = sum(weights)
+
+        parts = []
+        for weight in weights:
+            part = copy.copy(self)
+            part.ranks = [[] for _ in range(self.level + 1)]
+            part.errors = [[] for _ in range(self.level + 1)]
+            part.rel_errors = [[] for _ in range(self.level + 1)]
+            part.error_sq = 0.0
+            part.level_error_sq = 0.0
+            part.level_budget_sq = None
+            part.budget_levels = None
+            if self.error_budget is not None:
+                remaining_sq = max(self.remaining_budget_sq(), 0.0)
+                part.error_budget = np.sqrt(
+                    remaining_sq * weight / total_weight if total_weight else 0.0
+                )
+            parts.append(part)
+
+        return parts
+
+    def merge(self, parts: List['RankControl']) -> None:
+        """
+        Adds the ranks and errors recorded by policies obtained from split().
+        """
+        for part in parts:
+            self.ranks[self.level].extend(part.ranks[self.level])
+            self.errors[self.level].extend(part.errors[self.level])
+            self.rel_errors[self.level].extend(part.rel_errors[self.level])
+            self.error_sq += part.error_sq
+            self.level_error_sq += part.error_sq
+
+    def tolerance(self, level: int) -> float:
+        """
+        Returns the singular value tolerance used at the given level.
+        """
+        if self.level_eps:
+            return self.level_eps[min(level, len(self.level_eps) - 1)]
+        return self.eps
+
+    def rank_cap(self, level: int) -> Optional[int]:
+        """
+        Returns the hard rank cap at the given level (None if there is no cap).
+        """
+        if self.max_rank is None or not isinstance(self.max_rank, list):
+            return self.max_rank
+        return self.max_rank[min(level, len(self.max_rank) - 1)]
+
+    def truncate(self, S: np.array) -> int:
+        """
+        Chooses the rank of the far blocks of one pivot and records the error.
+
+        Args:
+            S: Singular values of the stacked far blocks (in descending order).
+
+        Returns:
+            r: Rank of far blocks
+        """
+        if self.level < 0:
+            self.start_level()
+        level = self.level
+
+        if len(S) == 0 or S[0] == 0:
+            r = 0
+        else:
+            eps = self.tolerance(level)
+            threshold = eps if self.absolute else eps * S[0]
+            r = len(S[S > threshold])
+
+        # tail[k] is the Frobenius norm of S[k:], i.e. the error of keeping rank k
+        tail = np.sqrt(np.append(np.cumsum((S**2)[::-1])[::-1], 0.0))
+
+        remaining_sq = self.remaining_budget_sq()
+        if remaining_sq is not None:
+            while r < len(S) and tail[r]**2 > remaining_sq:
+                r += 1
+
+        cap = self.rank_cap(level)
+        if cap is not None:
+            r = min(r, cap)
+
+        error = tail[r]
+        self.error_sq += error**2
+        self.level_error_sq += error**2
+        self.ranks[level].append(r)
+        self.errors[level].append(error)
+        self.rel_errors[level].append(error / S[0] if len(S) and S[0] else 0.0)
+
+        return r
+
+    def report(self) -> Dict:
+        """
+        Returns the truncations made so far. These are local truncation norms,
+        no amplification by the M_L and M_R factors is accounted for.
+
+        Returns:
+            dict: Contains the following elements:
+                - total_error (float): Root-sum-square of the local truncation
+                  errors of all pivots.
+                - max_error (float): Largest truncation error of one pivot.
+                - max_rel_error (float): Largest error of one pivot relative to
+                  the largest singular value of its far blocks.
+                - absolute (bool): Whether the tolerances are absolute.
+                - error_budget (float or None): The requested budget.
+                - budget_exceeded (bool): True if total_error > error_budget.
+                - levels (list): Per-level dicts with tolerance, rank cap,
+                  ranks, total and max error.
+        """
+        levels = []
+        for level in range(len(self.ranks)):
+            errors = self.errors[level]
+            levels.append({
+                'eps': self.tolerance(level),
+                'max_rank': self.rank_cap(level),
+                'ranks': list(self.ranks[level]),
+                'total_error': float(np.sqrt(np.sum(np.square(errors)))),
+                'max_error': float(max(errors, default=0.0)),
+            })
+
+        total_error = float(np.sqrt(self.error_sq))
+        return {
+            'total_error': total_error,
+            'max_error': max((lvl['max_error'] for lvl in levels), default=0.0),
+            'max_rel_error': float(max(
+                (e for errs in self.rel_errors for e in errs), default=0.0
+            )),
+            'absolute': self.absolute,
+            'error_budget': self.error_budget,
+            'budget_exceeded': (self.error_budget is not None
+                                and total_error > self.error_budget),
+            'levels': levels,
+        }